@@ -0,0 +1,38 @@
+import os
+import subprocess
+import statistics
+import sys
+import time
+
+# Measures the wall-clock startup cost of the driver, which is what short CNF
+# jobs and usage errors pay in batch runs. Qiskit is imported lazily, so the
+# "usage error" and "import driver" cases should stay well under a second,
+# while "import qiskit" shows the cost that is now deferred until a circuit
+# is actually built.
+
+REPO = os.path.dirname(os.path.abspath(__file__))
+
+CASES = {
+    "usage error": [sys.executable, os.path.join(REPO, "driver.py")],
+    "import driver": [sys.executable, "-c", "import driver"],
+    "import qiskit": [sys.executable, "-c", "import qiskit, qiskit.providers.aer"],
+}
+
+def time_command(cmd, runs):
+# runs cmd the given number of times, returning the wall-clock time of each run
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(cmd, cwd=REPO, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        times.append(time.perf_counter() - start)
+    return times
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    print("{0:<16}{1:>10}{2:>10}" .format("case", "median", "min"))
+    for name, cmd in CASES.items():
+        times = time_command(cmd, runs)
+        print("{0:<16}{1:>9.3f}s{2:>9.3f}s" .format(name, statistics.median(times), min(times)))
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,20 @@
-from qiskit import *
+from __future__ import annotations
+
 import numpy as np
-from typing import List
+from typing import List, TYPE_CHECKING
 
 import grover
 
+if TYPE_CHECKING:
+    from qiskit import QuantumCircuit
+
 def qft(n: int) -> QuantumCircuit:
     """Returns a QuantumCircuit implementing the Quantum Fourier Transform
     for n bits
     Args:
         n: Width of the quantum circuit"""
+    from qiskit import QuantumCircuit
+
     qc = QuantumCircuit(n)
 
     # for every qubit
@@ -31,6 +37,8 @@ def quantum_counter(cnf: List[List[int]], num_vars: int, precision: int) -> Quan
         cnf: List of clauses of literals
         num_vars: number of distinct variables in CNF
         precision: how many bits should be used to encode result"""
+    from qiskit import QuantumCircuit
+
     n = num_vars
     t = precision
     qft_dagger = qft(t).to_gate().inverse()
@@ -1,26 +1,118 @@
-from operator import length_hint
-import unittest
-
-from qiskit import *
-from qiskit.circuit import *
-from qiskit import Aer
-from qiskit.providers.aer.library import *
-from qiskit.quantum_info import Statevector
-
-from qiskit import execute
-
 import numpy as np
 import math
 
+import os
 import sys
 import csv
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
 
 import counter, grover, oracle
 
+# Qiskit and Aer take seconds to import, so they are pulled in only once a
+# circuit is actually simulated; usage errors and argument parsing stay fast.
+_simulator = None
+
+def get_simulator():
+# returns the Aer simulator backend, creating it on first use and reusing
+# it for every later simulation in this process (warm start)
+    global _simulator
+    if _simulator is None:
+        from qiskit import Aer
+        _simulator = Aer.get_backend('aer_simulator')
+    return _simulator
+
+# Memory a single simulation may use, in GiB (QC_MEMORY_GB overrides it).
+# Matrix product state simulation has no fixed memory bound, so it is only
+# chosen when QC_ALLOW_MPS=1 and the dense statevector does not fit.
+DEFAULT_MEMORY_GB = 4
+
+def memory_budget():
+# returns the memory budget in bytes, read from QC_MEMORY_GB when it is
+# needed so a malformed value cannot break importing this module
+    value = os.environ.get("QC_MEMORY_GB")
+    if value is None:
+        return DEFAULT_MEMORY_GB * 2**30
+    try:
+        return float(value) * 2**30
+    except ValueError:
+        print("WARNING - QC_MEMORY_GB={0!r} is not a number, using {1} GiB"
+              .format(value, DEFAULT_MEMORY_GB), file=sys.stderr)
+        return DEFAULT_MEMORY_GB * 2**30
+
+def default_workers():
+# returns the number of cores parallel runs may use: QC_WORKERS, or every
+# core if it is unset or not a positive integer
+    cores = os.cpu_count() or 1
+    value = os.environ.get("QC_WORKERS")
+    if value is None:
+        return cores
+    if not value.isdigit() or int(value) < 1:
+        print("WARNING - QC_WORKERS={0!r} is not a positive integer, using {1}"
+              .format(value, cores), file=sys.stderr)
+        return cores
+    return int(value)
+
+def statevector_bytes(num_qubits, precision):
+# returns the size in bytes of a dense statevector over num_qubits qubits,
+# stored as complex128 ('double') or complex64 ('single') amplitudes
+    amplitude = 16 if precision == 'double' else 8
+    return amplitude * 2**num_qubits
+
+# Gates the stabilizer (tableau) method simulates in polynomial time, and
+# instructions that do not affect whether a circuit is Clifford
+CLIFFORD_GATES = {'id', 'x', 'y', 'z', 'h', 's', 'sdg', 'sx', 'sxdg', 'cx', 'cy', 'cz', 'swap'}
+DIRECTIVES = {'measure', 'barrier', 'reset'}
+
+def is_clifford(op):
+# returns whether a circuit or gate consists only of Clifford gates,
+# recursing into the definitions of composite gates. Other controlled gates
+# are treated as non-Clifford without building their (costly) definitions
+    if hasattr(op, 'data'):
+        definition = op
+    elif op.name in CLIFFORD_GATES or op.name in DIRECTIVES:
+        return True
+    elif getattr(op, 'num_ctrl_qubits', 0) > 0:
+        return False
+    else:
+        definition = op.definition
+    if definition is None:
+        return False
+    return all(is_clifford(inst) for inst, qargs, cargs in definition.data)
+
+def select_method(num_qubits, budget=None, allow_mps=None, clifford=False):
+# returns the (method, precision) pair the Aer simulator should use for a
+# circuit of num_qubits qubits. Clifford circuits use the stabilizer method,
+# whose memory is polynomial in num_qubits; otherwise double precision is
+# preferred, falling back to single precision, then matrix product state, as
+# the budget gets tighter.
+# Raises MemoryError with an estimate if the circuit cannot fit at all
+    if clifford:
+        return 'stabilizer', 'double'
+    if budget is None:
+        budget = memory_budget()
+    if allow_mps is None:
+        allow_mps = os.environ.get("QC_ALLOW_MPS") == "1"
+    for precision in ('double', 'single'):
+        if statevector_bytes(num_qubits, precision) <= budget:
+            return 'statevector', precision
+    if allow_mps:
+        return 'matrix_product_state', 'double'
+    raise MemoryError(
+        "Simulating {0} qubits needs at least {1:.2f} GiB (single precision "
+        "statevector) but the memory budget is {2:.2f} GiB"
+        .format(num_qubits, statevector_bytes(num_qubits, 'single') / 2**30, budget / 2**30))
+
+def optimization_level(method):
+# returns the transpiler optimization level to simulate with: the default,
+# except for the stabilizer method, where optimization would merge Clifford
+# gates into u3 gates the tableau cannot apply
+    return 0 if method == 'stabilizer' else None
+
 def measure_qubits(circ, indices):
 # adds classical bits to circuit which is result
 # of measuring select qubits
-    circ_m = QuantumCircuit(circ.num_qubits, circ.num_clbits)
+    from qiskit import ClassicalRegister
 
     num_qubits = len(indices)
     cr = ClassicalRegister(num_qubits)
@@ -29,21 +121,74 @@ def measure_qubits(circ, indices):
 
     return circ
 
+def prepare_circuit(dut, input_val):
+# returns a circuit that initializes the DUT's qubits to the basis state
+# input_val and then applies the DUT
+    from qiskit import QuantumCircuit
+
+    # the input is a basis state, so X gates prepare it without allocating
+    # a dense initial statevector; input 0 needs no preparation at all
+    circ = QuantumCircuit(dut.num_qubits, dut.num_clbits)
+    for qubit in range(circ.num_qubits):
+        if (input_val >> qubit) & 1:
+            circ.x(qubit)
+    circ.compose(dut, inplace=True)
+    return circ
+
 def test_circuit(dut, input_val, measure_indices, num_shots):
 # for a given device-under-test (DUT), initialize circuit with provided input,
 # measure each of the specified qubits, and simulate num_shots runs, returning
 # results
-    circ = QuantumCircuit(dut.num_qubits, dut.num_clbits)
-    initial_state = Statevector.from_int(input_val,2**circ.num_qubits)
-    circ.set_statevector(initial_state)
-    circ.compose(dut, inplace=True)
+    from qiskit import execute
+
+    # fail before building anything if the job cannot fit in memory
+    method, precision = select_method(dut.num_qubits, clifford=is_clifford(dut))
+
+    circ = prepare_circuit(dut, input_val)
     measure_qubits(circ, measure_indices)
 
-    sim = Aer.get_backend('aer_simulator')
-    result = execute(circ, sim, shots=num_shots).result()
+    result = execute(circ, get_simulator(), shots=num_shots, method=method,
+                     precision=precision, optimization_level=optimization_level(method)).result()
 
     return result.get_counts(circ)
 
+def marginal_probabilities(dut, input_val, measure_indices, threads=0):
+# simulates the DUT once and returns the probability of each outcome of the
+# specified qubits, marginalized over all other qubits (ancillas, output).
+# Entry i of the result is the probability of reading i, with
+# measure_indices[0] as the least significant bit, matching get_counts.
+# Aer marginalizes in place, so only the 2**len(measure_indices) result is
+# copied out of the simulator, whatever method it uses. threads caps Aer's
+# threads (0 uses every core)
+    from qiskit import execute
+    import qiskit.providers.aer.library  # registers QuantumCircuit.save_probabilities
+
+    method, precision = select_method(dut.num_qubits, clifford=is_clifford(dut))
+
+    circ = prepare_circuit(dut, input_val)
+    circ.save_probabilities(list(measure_indices))
+    result = execute(circ, get_simulator(), shots=1, method=method,
+                     precision=precision, optimization_level=optimization_level(method),
+                     max_parallel_threads=threads).result()
+    probs = np.asarray(result.data(circ)['probabilities'])
+    return probs / probs.sum()
+
+def sample_counts(probs, num_shots, rng=None):
+# draws num_shots outcomes from the distribution probs (as returned by
+# marginal_probabilities) and returns them in get_counts format
+    if rng is None:
+        rng = np.random.default_rng()
+    width = (len(probs) - 1).bit_length()
+    samples = rng.multinomial(num_shots, probs)
+    return {format(i, '0{0}b'.format(width)): int(c) for i, c in enumerate(samples) if c}
+
+def sample_circuit(dut, input_val, measure_indices, num_shots, threads=0):
+# same as test_circuit, but simulates the DUT only once and samples the
+# shots from the marginal distribution of the measured qubits, so the shot
+# count does not affect simulation cost. threads caps Aer's threads
+    probs = marginal_probabilities(dut, input_val, measure_indices, threads)
+    return sample_counts(probs, num_shots)
+
 def calc_solutions(value, num_vars, precision): 
     theta = 2 * np.pi * (value / (2**precision))
     m = (2**num_vars) * (np.sin(theta/2)**2)
@@ -62,13 +207,12 @@ def satisfy(result, cnf, pot):
             return False
     return True 
 
-def main():
-    if len(sys.argv) != 2:
-        sys.exit("Usage: ./%s [csv_file]" % sys.argv[0])
-    print()
+def read_cnf(path):
+# parses a CSV file of clauses (one clause per line, ~ for negation) into a
+# CNF of variable IDs, returning the CNF and the map of names to IDs
     cnf = []
     dict = {}
-    with open(sys.argv[1]) as f: 
+    with open(path) as f: 
         lines = f.readlines()
         count = 1
         for line in lines: 
@@ -87,9 +231,174 @@ def main():
                 else: 
                     clause.append(dict[el])
             cnf.append(clause)
+    return cnf, dict
+
+def to_assignment(result):
+# maps each variable ID to its bit in a measured result string (variable 1
+# is the rightmost bit)
+    pot = {}
+    count = 1
+    for i in reversed(range(len(result))): 
+        pot[count] = result[i]
+        count += 1
+    return pot
+
+def simplify_cnf(cnf, fixed):
+# returns the CNF left after assigning the variables in fixed (a map of
+# variable IDs to 0 or 1): satisfied clauses are dropped and falsified
+# literals removed. Returns None if some clause can no longer be satisfied
+    simplified = []
+    for clause in cnf:
+        kept = []
+        sat = False
+        for i in clause:
+            if abs(i) not in fixed:
+                kept.append(i)
+            elif (i > 0) == (fixed[abs(i)] == 1):
+                sat = True
+        if sat:
+            continue
+        if not kept:
+            return None
+        simplified.append(kept)
+    return simplified
+
+def partition_bytes(cnf, num_vars, k, precision):
+# returns the statevector size of one partition's counting circuit (the
+# widest circuit a partition runs) when k top variables are fixed. With
+# every variable fixed each partition is solved classically, costing nothing
+    if k == num_vars:
+        return 0
+    width = (num_vars - k) + precision + len(cnf) + 1
+    return statevector_bytes(width, 'single')
+
+def partition_bits(cnf, num_vars, precision, workers):
+# returns the smallest number of top variables to fix classically: 0 if the
+# whole problem fits in the memory budget, otherwise enough that workers
+# partitions simulated at once fit in it together. Fixing every variable
+# always fits, since no partition is then simulated
+    budget = memory_budget()
+    if partition_bytes(cnf, num_vars, 0, precision) <= budget:
+        return 0
+    for k in range(1, num_vars):
+        if workers * partition_bytes(cnf, num_vars, k, precision) <= budget:
+            return k
+    return num_vars
+
+# Aer threads each partition worker may use (0 outside workers: every core)
+_worker_threads = 0
+
+def init_worker(budget, threads):
+# gives a worker process its share of the memory budget and of the cores,
+# so that workers running at once neither exceed the budget together nor
+# oversubscribe the machine with Aer threads
+    global _worker_threads
+    os.environ["QC_MEMORY_GB"] = repr(budget / 2**30)
+    _worker_threads = threads
+
+def count_partition(cnf, num_vars, precision, num_shots):
+# estimates the number of solutions of one partition's CNF (worker process)
+    if not cnf:
+        # every assignment satisfies an empty CNF
+        return 2**num_vars
+    circ = counter.quantum_counter(cnf, num_vars, precision).to_gate()
+    counts = sample_circuit(circ, 0, range(precision), num_shots, _worker_threads)
+    value = int(max(counts, key=counts.get), 2)
+    return calc_solutions(value, num_vars, precision)
+
+def search_partition(cnf, num_vars, sols, num_shots):
+# runs Grover on one partition's CNF with the iteration count given by its
+# estimated number of solutions, returning the most frequent satisfying
+# result, or None if no sampled result satisfies the CNF (worker process)
+    if not cnf:
+        return '0' * num_vars
+    iters = math.trunc((np.pi / 4) * math.sqrt(2**num_vars / max(1, round(sols))))
+    circ = grover.grover(cnf, num_vars, iters).to_gate()
+    counts = sample_circuit(circ, 0, range(num_vars), num_shots, _worker_threads)
+    for result in sorted(counts, key=counts.get, reverse=True):
+        if satisfy(result, cnf, to_assignment(result)):
+            return result
+    return None
+
+def partitioned_search(cnf, dict, k, precision, workers=None):
+# fixes the top k variables classically, then counts and searches each of
+# the 2**k remaining subproblems of num_vars-k variables in parallel worker
+# processes, skipping partitions counted as empty. Prints the merged
+# solution count and a solution, if one is found
+    if workers is None:
+        workers = default_workers()
+    num_vars = len(dict)
+    n = num_vars - k
+    num_shots = 1000
+
+    # only run as many partitions at once as fit in the budget together, and
+    # give each worker its share of it
+    budget = memory_budget()
+    size = partition_bytes(cnf, num_vars, k, precision)
+    if size:
+        workers = max(1, min(workers, int(budget // size)))
+    print("PARTITION - Fixing {0} variable(s), {1} partitions of {2} variables, {3} worker(s)"
+          .format(k, 2**k, n, workers))
+
+    prefixes = []
+    cnfs = []
+    for p in range(2**k):
+        fixed = {n + 1 + j: (p >> j) & 1 for j in range(k)}
+        sub = simplify_cnf(cnf, fixed)
+        if sub is None:
+            continue
+        prefixes.append(format(p, '0{0}b'.format(k)) if k else '')
+        cnfs.append(sub)
+    print("PARTITION - {0} partition(s) not ruled out classically" .format(len(cnfs)))
+
+    threads = max(1, (os.cpu_count() or 1) // workers)
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker,
+                             initargs=(budget / workers, threads)) as executor:
+        estimates = list(executor.map(count_partition, cnfs, repeat(n), repeat(precision), repeat(num_shots)))
+        found = [i for i in range(len(cnfs)) if round(estimates[i]) > 0]
+        print("COUNT - Estimated number of solutions: {0:.2f}" .format(sum(estimates)))
+        print("PARTITION - Searching {0} non-empty partition(s)" .format(len(found)))
+        results = executor.map(search_partition, [cnfs[i] for i in found], repeat(n),
+                               [estimates[i] for i in found], repeat(num_shots))
+        for i, result in zip(found, results):
+            if result is not None:
+                # the remaining searches are no longer needed
+                executor.shutdown(wait=False, cancel_futures=True)
+                break
+        else:
+            print("GROVER - No solution found")
+            return
+
+    result = prefixes[i] + result
+    pot = to_assignment(result)
+    print("GROVER - Solution identified: ", end = '')
+    for name, var in dict.items():
+        if int(pot[var]) == 1:
+            print(name, end = ' ')
+    print()
+
+def main():
+    usage = "Usage: ./%s [csv_file] [partition_bits]" % sys.argv[0]
+    if len(sys.argv) not in (2, 3):
+        sys.exit(usage)
+    if len(sys.argv) == 3 and not sys.argv[2].isdigit():
+        sys.exit(usage)
+    print()
+    cnf, dict = read_cnf(sys.argv[1])
 
     num_vars = len(dict)
 
+    # split the search across worker processes when asked to, or when the
+    # whole problem does not fit in memory
+    precision = 5
+    if len(sys.argv) == 3:
+        k = min(int(sys.argv[2]), num_vars)
+    else:
+        k = partition_bits(cnf, num_vars, precision, default_workers())
+    if k > 0:
+        partitioned_search(cnf, dict, k, precision)
+        return
+
     print("COUNT - Counting solutions for {0} variables..." .format(num_vars))
 
     precision = 5 
@@ -97,7 +406,7 @@ def main():
     circ = qc.to_gate()
 
     num_shots = 1000
-    counts = test_circuit(circ.copy(), 0, range(precision), num_shots)
+    counts = sample_circuit(circ.copy(), 0, range(precision), num_shots)
 
     result = max(counts, key=counts.get)
     value = int(result, 2)
@@ -130,7 +439,7 @@ def main():
         circ = qc.to_gate()
 
         num_shots = 1000
-        counts = test_circuit(circ.copy(), 0, range(precision), num_shots)
+        counts = sample_circuit(circ.copy(), 0, range(precision), num_shots)
 
         result = max(counts, key=counts.get)
         value = int(result, 2)
@@ -151,16 +460,11 @@ def main():
 
     num_shots = 1000
     circ = qc.to_gate()
-    counts = test_circuit(circ.copy(), 0, range(num_vars), num_shots)
+    counts = sample_circuit(circ.copy(), 0, range(num_vars), num_shots)
     result = max(counts, key=counts.get)
     # print(result)
     # print(dict)
-    pot = {}
-    count = 1
-    for i in reversed(range(len(result))): 
-        pot[count] = result[i]
-        count += 1
-    # print(pot)
+    pot = to_assignment(result)
     if satisfy(result, cnf, pot):
         print( "GROVER - Solution identified: ", end = '')
         i = 1
@@ -175,15 +479,11 @@ def main():
         print("GROVER - Running search with {0} Grover iteration(s)" .format(iter))
         num_shots = 1000
         circ = qc.to_gate()
-        counts = test_circuit(circ.copy(), 0, range(num_vars), num_shots)
+        counts = sample_circuit(circ.copy(), 0, range(num_vars), num_shots)
         result = max(counts, key=counts.get)
         # print(result)
         # print(dict)
-        pot = {}
-        count = 1
-        for i in reversed(range(len(result))): 
-            pot[count] = result[i]
-            count += 1
+        pot = to_assignment(result)
         if satisfy(result, cnf, pot):
             print( "GROVER - Solution identified: ", end = '')
             i = 1
@@ -196,5 +496,8 @@ def main():
             print("GROVER: No solution found after 10 attempts")
 
 if __name__ == "__main__":
-    main()
+    try:
+        main()
+    except MemoryError as e:
+        sys.exit("ERROR - {0}" .format(e))
 
@@ -1,11 +1,17 @@
+from __future__ import annotations
+
 import oracle
-from qiskit import *
-from typing import List
+from typing import List, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from qiskit import QuantumCircuit
 
 def diffuser(num_vars: int) -> QuantumCircuit:
     """Returns QuantumCircuit that rotates the state around |s>
     Args:
         num_vars: How many variables are input into the diffuser"""
+    from qiskit import QuantumCircuit
+
     n = num_vars
     qc = QuantumCircuit(n)
 
@@ -44,6 +50,8 @@ def grover_iteration(cnf: List[List[int]], num_vars: int) -> QuantumCircuit:
     Args:
         cnf: List of clauses of literals
         num_vars: How many variables are taken as input to the oracle"""
+    from qiskit import QuantumCircuit
+
     bf_oracle = oracle.get_bitflip_oracle(cnf, num_vars)
     phase_oracle = oracle.bf_to_phase_oracle(bf_oracle, num_vars)
     qc = QuantumCircuit(phase_oracle.num_qubits)
@@ -60,6 +68,8 @@ def grover(cnf: List[List[int]], num_vars: int, num_iters: int) -> QuantumCircui
         cnf: List of clauses of literals
         num_vars: How many variables are taken as input to the oracle
         num_iters: How many Grover iterations should be included"""
+    from qiskit import QuantumCircuit
+
     qc = QuantumCircuit(num_vars + len(cnf) + 1)
 
     qc.h(range(num_vars))
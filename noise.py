@@ -0,0 +1,208 @@
+from __future__ import annotations
+
+import math
+import sys
+import time
+from typing import Dict, List, TYPE_CHECKING
+
+import numpy as np
+
+import counter, driver, grover
+
+if TYPE_CHECKING:
+    from qiskit import QuantumCircuit
+    from qiskit.providers.aer.noise import NoiseModel
+
+# Circuits are transpiled to this gate set before simulation, so that every
+# gate they contain picks up the depolarizing errors of the noise model
+BASIS_GATES = ['u', 'cx']
+
+def noise_model(p1: float, p2: float, readout: float,
+                single_qubit_gates: List[str] = None) -> NoiseModel:
+    """Returns an Aer NoiseModel with depolarizing errors on every gate and
+    a symmetric readout error on every measurement
+    Args:
+        p1: Depolarizing probability of single-qubit gates
+        p2: Depolarizing probability of two-qubit (CX) gates
+        readout: Probability that a measured bit is flipped
+        single_qubit_gates: Gates that p1 applies to, by default 'u' (pass
+            Clifford gates for circuits run on the stabilizer method)"""
+    from qiskit.providers.aer.noise import NoiseModel, ReadoutError, depolarizing_error
+
+    if single_qubit_gates is None:
+        single_qubit_gates = ['u']
+    model = NoiseModel(basis_gates=single_qubit_gates + ['cx'])
+    if p1 > 0:
+        model.add_all_qubit_quantum_error(depolarizing_error(p1, 1), single_qubit_gates)
+    if p2 > 0:
+        model.add_all_qubit_quantum_error(depolarizing_error(p2, 2), ['cx'])
+    if readout > 0:
+        model.add_all_qubit_readout_error(ReadoutError([[1 - readout, readout], [readout, 1 - readout]]))
+    return model
+
+def scaled_noise_model(strength: float) -> NoiseModel:
+    """Returns a NoiseModel parametrized by a single noise strength, with
+    two-qubit gates ten times noisier than single-qubit gates
+    Args:
+        strength: Depolarizing probability of CX gates and readout flip
+            probability; single-qubit gates use strength / 10"""
+    return noise_model(strength / 10, strength, strength)
+
+def run_noisy(dut: QuantumCircuit, measure_indices: List[int], num_shots: int,
+              model: NoiseModel, workers: int = None,
+              timings: List[float] = None) -> Dict[str, int]:
+    """Simulates the DUT from input 0 under the given noise model and returns
+    the counts of the measured qubits. Each shot is an independent Monte Carlo
+    trajectory, and trajectories are spread over the given number of cores
+    Args:
+        dut: Circuit or gate to simulate
+        measure_indices: Qubits to measure
+        num_shots: Number of trajectories to sample
+        model: Noise model to apply
+        workers: Number of cores to use (defaults to driver.default_workers())
+        timings: If given, the wall time of the simulation alone (without
+            circuit construction and transpilation) is appended to it"""
+    from qiskit import execute, transpile
+
+    if workers is None:
+        workers = driver.default_workers()
+    budget = driver.memory_budget()
+    method, precision = driver.select_method(dut.num_qubits, budget)
+
+    # every trajectory run in parallel holds its own statevector, so only as
+    # many run at once as fit in the memory budget together
+    parallel_shots = workers
+    if method == 'statevector':
+        copies = int(budget // driver.statevector_bytes(dut.num_qubits, precision))
+        parallel_shots = max(1, min(workers, copies))
+
+    circ = driver.prepare_circuit(dut, 0)
+    driver.measure_qubits(circ, measure_indices)
+    circ = transpile(circ, basis_gates=BASIS_GATES)
+
+    start = time.perf_counter()
+    result = execute(circ, driver.get_simulator(), shots=num_shots, noise_model=model,
+                     method=method, precision=precision, max_memory_mb=int(budget / 2**20),
+                     max_parallel_threads=workers, max_parallel_shots=parallel_shots).result()
+    if timings is not None:
+        timings.append(time.perf_counter() - start)
+    return result.get_counts(circ)
+
+def count_solutions(cnf: List[List[int]], num_vars: int) -> int:
+    """Returns the exact number of satisfying assignments of the CNF by
+    classical enumeration
+    Args:
+        cnf: List of clauses of literals
+        num_vars: number of distinct variables in CNF"""
+    total = 0
+    for x in range(2**num_vars):
+        bits = format(x, '0{0}b'.format(num_vars))
+        if driver.satisfy(bits, cnf, driver.to_assignment(bits)):
+            total += 1
+    return total
+
+def grover_success(cnf: List[List[int]], num_vars: int, num_iters: int, model: NoiseModel,
+                   num_shots: int = 1000, workers: int = None,
+                   timings: List[float] = None) -> float:
+    """Returns the fraction of noisy Grover shots that measure a satisfying
+    assignment
+    Args:
+        cnf: List of clauses of literals
+        num_vars: number of distinct variables in CNF
+        num_iters: How many Grover iterations to run
+        model: Noise model to apply
+        num_shots: Number of trajectories to sample
+        workers: Number of cores to use
+        timings: If given, collects the simulation time (see run_noisy)"""
+    qc = grover.grover(cnf, num_vars, num_iters)
+    counts = run_noisy(qc.to_gate(), range(num_vars), num_shots, model, workers, timings)
+    hits = sum(c for bits, c in counts.items()
+               if driver.satisfy(bits, cnf, driver.to_assignment(bits)))
+    return hits / num_shots
+
+def counting_estimate(cnf: List[List[int]], num_vars: int, precision: int, model: NoiseModel,
+                      num_shots: int = 1000, workers: int = None,
+                   timings: List[float] = None) -> float:
+    """Returns the number of solutions estimated by a noisy quantum counter
+    from its most frequent outcome
+    Args:
+        cnf: List of clauses of literals
+        num_vars: number of distinct variables in CNF
+        precision: how many bits should be used to encode result
+        model: Noise model to apply
+        num_shots: Number of trajectories to sample
+        workers: Number of cores to use
+        timings: If given, collects the simulation time (see run_noisy)"""
+    qc = counter.quantum_counter(cnf, num_vars, precision)
+    counts = run_noisy(qc.to_gate(), range(precision), num_shots, model, workers, timings)
+    value = int(max(counts, key=counts.get), 2)
+    return driver.calc_solutions(value, num_vars, precision)
+
+USAGE = """Usage: ./%s [csv_file] [--workers=N,...] [--shots=N] [noise_strength ...]
+Every shot is a separate noisy trajectory through the transpiled circuits, so
+runs are slow: on one core, a 3 variable CNF takes about 90s per 200 shots at
+strength 1e-2 and the whole default sweep a few minutes. The default is 200
+shots at strengths 0, 1e-4, 1e-3, 1e-2, on 1 core and on every core."""
+
+def main():
+    usage = USAGE % sys.argv[0]
+    if len(sys.argv) < 2:
+        sys.exit(usage)
+    # by default compare a single core against every core, to show scaling
+    worker_counts = sorted({1, driver.default_workers()})
+    num_shots = 200
+    strengths = []
+    try:
+        for arg in sys.argv[2:]:
+            if arg.startswith("--workers="):
+                worker_counts = [int(w) for w in arg[len("--workers="):].split(',')]
+            elif arg.startswith("--shots="):
+                num_shots = int(arg[len("--shots="):])
+            else:
+                strengths.append(float(arg))
+    except ValueError:
+        sys.exit(usage)
+    if min(worker_counts) < 1 or num_shots < 1:
+        sys.exit(usage)
+    strengths = strengths or [0, 1e-4, 1e-3, 1e-2]
+    print()
+    cnf, dict = driver.read_cnf(sys.argv[1])
+    num_vars = len(dict)
+
+    precision = 5
+    sols = count_solutions(cnf, num_vars)
+    if sols == 0:
+        iters = 0
+    else:
+        # optimal count, which is 0 when over half the assignments are solutions
+        iters = math.floor(np.pi / (4 * math.asin(math.sqrt(sols / 2**num_vars))))
+    print("NOISE - {0} variables, {1} solutions, {2} Grover iteration(s), {3} shots"
+          .format(num_vars, sols, iters, num_shots))
+    # 'sim' is the time spent simulating trajectories, which is what the
+    # cores share; 'total' adds the serial circuit construction and transpile
+    print("NOISE - {0:>10} {1:>7} {2:>10} {3:>10} {4:>10} {5:>9} {6:>9} {7:>8}"
+          .format("strength", "cores", "success", "estimate", "error", "sim", "total", "speedup"))
+
+    for strength in strengths:
+        model = scaled_noise_model(strength)
+        baseline = None
+        for workers in worker_counts:
+            timings = []
+            start = time.perf_counter()
+            if sols:
+                success = grover_success(cnf, num_vars, iters, model, num_shots, workers, timings)
+            else:
+                success = 0.0
+            m = counting_estimate(cnf, num_vars, precision, model, num_shots, workers, timings)
+            elapsed = time.perf_counter() - start
+            sim = sum(timings)
+            if baseline is None:
+                baseline = sim
+            print("NOISE - {0:>10.1e} {1:>7} {2:>10.3f} {3:>10.2f} {4:>10.2f} {5:>8.2f}s {6:>8.2f}s {7:>7.2f}x"
+                  .format(strength, workers, success, m, abs(m - sols), sim, elapsed, baseline / sim))
+
+if __name__ == "__main__":
+    try:
+        main()
+    except MemoryError as e:
+        sys.exit("ERROR - {0}" .format(e))
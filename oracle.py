@@ -1,11 +1,11 @@
-from qiskit import QuantumCircuit
+from __future__ import annotations
 
-from qiskit.circuit import QuantumRegister, ClassicalRegister, AncillaRegister
-from qiskit.circuit.library.standard_gates import SXGate, MCXGate
-
-from typing import List
+from typing import List, TYPE_CHECKING
 import numpy as np
 
+if TYPE_CHECKING:
+    from qiskit import QuantumCircuit
+
 # RESTRICTIONS ON CNF (you do not need to verify these):
 # every variable appears at least once in CNF
 # no variable appears twice in one term
@@ -19,6 +19,8 @@ def bf_to_phase_oracle(bf_oracle: QuantumCircuit, num_vars: int) -> QuantumCircu
     Args:
         bf_oracle: Bitflip oracle to be converted to a phase oracle
         num_vars: How many variables are taken as input to the oracle"""
+    from qiskit import QuantumCircuit
+
     qc = QuantumCircuit(bf_oracle.num_qubits)
     qc.x(num_vars)
     qc.h(num_vars)
@@ -32,6 +34,10 @@ def get_bitflip_oracle(cnf: List[List[int]], num_vars: int) -> QuantumCircuit:
     Args:
         cnf: Array of clauses of literals
         num_vars: How many variables are taken as input to the oracle"""
+    from qiskit import QuantumCircuit
+    from qiskit.circuit import QuantumRegister, AncillaRegister
+    from qiskit.circuit.library.standard_gates import MCXGate
+
     l = len(cnf) 
     inputs = QuantumRegister(num_vars, "inputs")
     output = QuantumRegister(1, "output")
@@ -0,0 +1,220 @@
+from __future__ import annotations
+
+from typing import Dict, List, TYPE_CHECKING
+
+import driver
+
+if TYPE_CHECKING:
+    from qiskit import QuantumCircuit
+    from qiskit.providers.aer.noise import NoiseModel
+
+# Logical qubit q of an encoded circuit is stored in the block of physical
+# qubits q*distance .. (q+1)*distance-1, using a repetition code in either
+# the 'bit' basis (|0>_L = |00..0>, protects against X errors) or the
+# 'phase' basis (|0>_L = |++..+>, protects against Z errors). Neither code
+# has a transversal logical H: H on every qubit of a block only moves the
+# same logical state into the other code.
+
+def block(qubit: int, distance: int) -> List[int]:
+    """Returns the physical qubits that store a logical qubit
+    Args:
+        qubit: Index of the logical qubit
+        distance: Number of physical qubits per logical qubit"""
+    return list(range(qubit * distance, (qubit + 1) * distance))
+
+def encoder(distance: int, basis: str = 'bit') -> QuantumCircuit:
+    """Returns a QuantumCircuit encoding an arbitrary state of qubit 0 into a
+    repetition code over qubits 0..distance-1. The CX fan-out is not fault
+    tolerant, so known states such as |0>_L are better prepared directly
+    Args:
+        distance: Number of physical qubits in the code
+        basis: 'bit' for the bit-flip code, 'phase' for the phase-flip code"""
+    from qiskit import QuantumCircuit
+
+    qc = QuantumCircuit(distance)
+    for qubit in range(1, distance):
+        qc.cx(0, qubit)
+    if basis == 'phase':
+        qc.h(range(distance))
+    return qc
+
+def syndrome_circuit(distance: int, basis: str = 'bit') -> QuantumCircuit:
+    """Returns a QuantumCircuit that measures the parity of each neighbouring
+    pair of data qubits (ZZ for the bit-flip code, XX for the phase-flip
+    code) into an ancilla, and reads the ancillas out into classical bits
+    Args:
+        distance: Number of data qubits (qubits 0..distance-1); ancillas are
+            qubits distance..2*distance-2
+        basis: 'bit' for the bit-flip code, 'phase' for the phase-flip code"""
+    from qiskit import QuantumCircuit
+
+    qc = QuantumCircuit(2 * distance - 1, distance - 1)
+    if basis == 'phase':
+        qc.h(range(distance))
+    for i in range(distance - 1):
+        qc.cx(i, distance + i)
+        qc.cx(i + 1, distance + i)
+    if basis == 'phase':
+        qc.h(range(distance))
+    qc.measure(range(distance, 2 * distance - 1), range(distance - 1))
+    return qc
+
+def decode_syndrome(syndrome: List[int]) -> List[int]:
+    """Returns the data qubits to flip for a repetition code syndrome, using
+    the lowest-weight error consistent with it
+    Args:
+        syndrome: Parities of data qubits (i, i+1), as measured by
+            syndrome_circuit"""
+    errors = [0]
+    for parity in syndrome:
+        errors.append(errors[-1] ^ parity)
+    # the complementary pattern has the same syndrome; keep the lighter one
+    if 2 * sum(errors) > len(errors):
+        errors = [1 - e for e in errors]
+    return [i for i, e in enumerate(errors) if e]
+
+def encode_clifford(logical: QuantumCircuit, distance: int,
+                    basis: str = 'bit') -> QuantumCircuit:
+    """Returns a QuantumCircuit applying the logical circuit to repetition
+    encoded blocks. Only gates with a transversal (or single-qubit) encoding
+    are supported: X, Z and CX. Any other gate, including H, raises a
+    ValueError
+    Args:
+        logical: Circuit of x, z and cx gates on logical qubits
+        distance: Number of physical qubits per logical qubit
+        basis: Code every block is encoded in ('bit' or 'phase')"""
+    from qiskit import QuantumCircuit
+
+    qc = QuantumCircuit(logical.num_qubits * distance)
+    index = {q: i for i, q in enumerate(logical.qubits)}
+
+    for inst, qargs, cargs in logical.data:
+        qubits = [index[q] for q in qargs]
+        if inst.name == 'barrier':
+            continue
+        elif inst.name in ('x', 'z'):
+            # in the bit basis X_L is transversal X and Z_L is Z on a single
+            # qubit; the phase basis swaps the roles of X and Z
+            q = qubits[0]
+            targets = block(q, distance) if inst.name == 'x' else block(q, distance)[:1]
+            if (inst.name == 'x') == (basis == 'bit'):
+                qc.x(targets)
+            else:
+                qc.z(targets)
+        elif inst.name == 'cx':
+            c, t = qubits
+            # in the phase basis a transversal CX acts with control and target swapped
+            if basis == 'phase':
+                c, t = t, c
+            for pc, pt in zip(block(c, distance), block(t, distance)):
+                qc.cx(pc, pt)
+        else:
+            raise ValueError("{0} has no transversal repetition code encoding" .format(inst.name))
+    return qc
+
+def encoded_circuit(logical: QuantumCircuit, distance: int,
+                    basis: str = 'bit') -> QuantumCircuit:
+    """Returns a QuantumCircuit that prepares every logical qubit in |0>_L,
+    applies the encoded logical circuit, extracts each block's syndrome into
+    its own ancillas and finally measures every data qubit in the basis of
+    the code. The 'syndrome' register holds the distance-1 parities of each
+    block in turn, and the 'data' register the data qubits
+    Args:
+        logical: Circuit of x, z and cx gates on logical qubits
+        distance: Number of physical qubits per logical qubit
+        basis: Code every block is encoded in ('bit' or 'phase')"""
+    from qiskit import ClassicalRegister, QuantumCircuit
+
+    n = logical.num_qubits
+    data = ClassicalRegister(n * distance, 'data')
+    syndrome = ClassicalRegister(n * (distance - 1), 'syndrome')
+    qc = QuantumCircuit(n * (2 * distance - 1))
+    qc.add_register(data)
+    qc.add_register(syndrome)
+
+    # |0>_L is prepared directly rather than with encoder, whose CX fan-out
+    # would spread a single early fault on qubit 0 across the whole block
+    ancillas = [n * distance + a for a in range(n * (distance - 1))]
+    if basis == 'phase':
+        qc.h(range(n * distance))
+    qc.compose(encode_clifford(logical, distance, basis), qubits=range(n * distance), inplace=True)
+    for q in range(n):
+        parities = ancillas[q * (distance - 1):(q + 1) * (distance - 1)]
+        qc.compose(syndrome_circuit(distance, basis), qubits=block(q, distance) + parities,
+                   clbits=syndrome[q * (distance - 1):(q + 1) * (distance - 1)], inplace=True)
+    if basis == 'phase':
+        qc.h(range(n * distance))
+    qc.measure(range(n * distance), data)
+    return qc
+
+def decode_block(syndrome: List[int], values: List[int]) -> int:
+    """Returns the logical value of one block from its extracted syndrome and
+    its measured data bits. Errors may occur before the extraction (seen by
+    the syndrome), after it (seen only by the data) or on the syndrome bits
+    themselves, so the decoder picks the logical value explained by the
+    fewest such errors. A dynamic program along the chain over whether each
+    data qubit had an error before extraction finds it in linear time
+    Args:
+        syndrome: Parities measured by syndrome_circuit
+        values: Measured data bits of the block"""
+    costs = []
+    for x in (0, 1):
+        # best[e] is the fewest errors explaining qubits 0..i and the
+        # syndrome bits between them, given qubit i's error before extraction e
+        best = [e + (values[0] ^ x ^ e) for e in (0, 1)]
+        for i in range(1, len(values)):
+            best = [e + (values[i] ^ x ^ e)
+                    + min(best[f] + (syndrome[i - 1] ^ f ^ e) for f in (0, 1))
+                    for e in (0, 1)]
+        costs.append(min(best))
+    return 0 if costs[0] <= costs[1] else 1
+
+def decode_readout(bits: str, num_logical: int, distance: int) -> str:
+    """Returns the logical bitstring for one shot of encoded_circuit, decoding
+    each block with decode_block
+    Args:
+        bits: Counts key of encoded_circuit ('syndrome data', with bit 0 of
+            each register rightmost)
+        num_logical: Number of logical qubits
+        distance: Number of physical qubits per logical qubit"""
+    syndrome, data = bits.split(' ') if ' ' in bits else ('', bits)
+    syndrome = [int(b) for b in reversed(syndrome)]
+    data = [int(b) for b in reversed(data)]
+    logical = ''
+    for q in range(num_logical):
+        value = decode_block(syndrome[q * (distance - 1):(q + 1) * (distance - 1)],
+                             data[q * distance:(q + 1) * distance])
+        logical = str(value) + logical
+    return logical
+
+def run_encoded(logical: QuantumCircuit, distance: int, num_shots: int,
+                model: NoiseModel = None, basis: str = 'bit',
+                workers: int = None) -> Dict[str, int]:
+    """Simulates the encoded logical circuit, including syndrome extraction,
+    with the stabilizer (tableau) method, whose cost is polynomial in the
+    number of physical qubits, and returns the counts of the decoded logical
+    outcomes
+    Args:
+        logical: Circuit of x, z and cx gates on logical qubits
+        distance: Number of physical qubits per logical qubit
+        num_shots: Number of shots to sample
+        model: Optional noise model, built over Clifford gates (see
+            noise.noise_model)
+        basis: Code every block is encoded in ('bit' or 'phase')
+        workers: Number of cores to use (defaults to driver.default_workers())"""
+    from qiskit import execute
+
+    if workers is None:
+        workers = driver.default_workers()
+    qc = encoded_circuit(logical, distance, basis)
+    method, precision = driver.select_method(qc.num_qubits, clifford=True)
+    result = execute(qc, driver.get_simulator(), shots=num_shots, noise_model=model,
+                     optimization_level=driver.optimization_level(method),
+                     method=method, precision=precision,
+                     max_parallel_threads=workers, max_parallel_shots=workers).result()
+
+    counts = {}
+    for bits, c in result.get_counts(qc).items():
+        key = decode_readout(bits, logical.num_qubits, distance)
+        counts[key] = counts.get(key, 0) + c
+    return counts
@@ -11,8 +11,11 @@ from qiskit import execute
 
 import numpy as np
 import math
+import os
+import subprocess
+import sys
 
-import driver, oracle, grover, counter
+import driver, oracle, grover, counter, noise, qec
 
 def measure_qubits(circ, indices):
 # adds classical bits to circuit which is result
@@ -144,5 +147,152 @@ class PublicTests(unittest.TestCase):
 
         self.assertTrue(np.allclose(np.round(m), 3))
 
+    def test_lazy_imports(self):
+        # importing the algorithm modules must not pull in Qiskit
+        code = "import sys, driver; print('qiskit' in sys.modules)"
+        out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True,
+                             cwd=os.path.dirname(os.path.abspath(__file__)))
+        self.assertEqual(out.returncode, 0, out.stderr)
+        self.assertEqual(out.stdout.strip(), 'False')
+
+    def test_select_method(self):
+        # 10 qubits fit comfortably in double precision
+        self.assertEqual(driver.select_method(10, budget=2**30), ('statevector', 'double'))
+        # 2**20 * 8 bytes fits in single precision but not double
+        self.assertEqual(driver.select_method(20, budget=2**23, allow_mps=False), ('statevector', 'single'))
+        self.assertEqual(driver.select_method(30, budget=2**23, allow_mps=True), ('matrix_product_state', 'double'))
+        with self.assertRaises(MemoryError):
+            driver.select_method(30, budget=2**23, allow_mps=False)
+
+        # QC_ALLOW_MPS is honoured even when set after import
+        os.environ["QC_ALLOW_MPS"] = "1"
+        try:
+            self.assertEqual(driver.select_method(30, budget=2**23), ('matrix_product_state', 'double'))
+        finally:
+            del os.environ["QC_ALLOW_MPS"]
+
+        # a malformed QC_MEMORY_GB falls back to the default budget
+        os.environ["QC_MEMORY_GB"] = "lots"
+        try:
+            self.assertEqual(driver.memory_budget(), driver.DEFAULT_MEMORY_GB * 2**30)
+        finally:
+            del os.environ["QC_MEMORY_GB"]
+
+    def test_marginal_sampling(self):
+        # marginal sampling must agree with measuring the full circuit
+        input = [[1],[2]]
+        num_vars = 2
+        circ = grover.grover(input, num_vars, num_iters=1)
+        counts = driver.sample_circuit(circ.copy(), 0, range(num_vars), 10)
+        self.assertEqual(counts, {'11': 10})
+
+        # non-zero input, measuring only the oracle output qubit
+        input = [[1,2],[-1,-2]]
+        circ = oracle.get_bitflip_oracle(input, num_vars)
+        counts = driver.sample_circuit(circ.copy(), 0b01, [num_vars], 10)
+        self.assertEqual(counts, {'1': 10})
+
+        # with no iterations the search register is uniform over 4 qubits
+        input = [[1, 2], [3], [-4]]
+        probs = driver.marginal_probabilities(grover.grover(input, 4, 0), 0, range(4))
+        self.assertTrue(np.allclose(probs, np.full(16, 1/16)))
+
+    def test_noisy_grover(self):
+        # (var1) and (var2), solution 11
+        input = [[1],[2]]
+        num_vars = 2
+        self.assertEqual(noise.count_solutions(input, num_vars), 1)
+
+        # without noise the single solution is always found
+        model = noise.scaled_noise_model(0)
+        self.assertEqual(noise.grover_success(input, num_vars, 1, model, 100), 1.0)
+
+        # 20% readout error alone succeeds on both bits ~64% of the time
+        model = noise.noise_model(0, 0, 0.2)
+        success = noise.grover_success(input, num_vars, 1, model, 1000)
+        self.assertTrue(0.5 < success < 0.8)
+
+    def test_repetition_code(self):
+        # syndromes of single errors on a distance-3 code
+        self.assertEqual(qec.decode_syndrome([1, 0]), [0])
+        self.assertEqual(qec.decode_syndrome([1, 1]), [1])
+        self.assertEqual(qec.decode_syndrome([0, 1]), [2])
+
+        # syndrome extraction reads the parities of a flipped data qubit
+        circ = QuantumCircuit(5, 2)
+        circ.x(1)
+        circ.compose(qec.syndrome_circuit(3), inplace=True)
+        self.assertEqual(execute(circ, Aer.get_backend('aer_simulator'), shots=10).result().get_counts(), {'11': 10})
+
+        # encoded X and CX layers decode to the same result as unencoded
+        logical = QuantumCircuit(3)
+        logical.x(0)
+        logical.cx(0, 1)
+        logical.z(2)
+        for basis in ('bit', 'phase'):
+            counts = qec.run_encoded(logical, 3, 100, basis=basis)
+            self.assertEqual(counts, {'011': 100})
+
+        # a single H has no transversal encoding
+        logical_h = QuantumCircuit(1)
+        logical_h.h(0)
+        with self.assertRaises(ValueError):
+            qec.encode_clifford(logical_h, 3)
+
+        # a single wrong syndrome bit is outvoted by consistent data
+        self.assertEqual(qec.decode_block([1, 0], [0, 0, 0]), 0)
+        self.assertEqual(qec.decode_block([1, 0], [1, 0, 0]), 0)
+
+        # with gate and readout errors, failures drop as the distance grows
+        model = noise.noise_model(0.01, 0.01, 0.01, ['x', 'z', 'h'])
+        successes = [qec.run_encoded(logical, d, 4000, model).get('011', 0) for d in (1, 3, 7)]
+        self.assertLess(successes[0], successes[1])
+        self.assertLess(successes[1], successes[2])
+
+    def test_clifford_method(self):
+        self.assertTrue(driver.is_clifford(grover.diffuser(1)))
+        self.assertFalse(driver.is_clifford(grover.diffuser(3)))
+        # the stabilizer path gives the same result as the unencoded diffuser
+        self.assertEqual(driver.test_circuit(grover.diffuser(1), 0, range(1), 10), {'1': 10})
+        self.assertEqual(driver.sample_circuit(grover.diffuser(1), 0, range(1), 10), {'1': 10})
+        self.assertEqual(driver.select_method(1000, budget=2**23, clifford=True), ('stabilizer', 'double'))
+
+    def test_partitions(self):
+        input = [[1, 2], [-2, 3], [-3]]
+        # fixing var3 = 1 falsifies the last clause
+        self.assertIsNone(driver.simplify_cnf(input, {3: 1}))
+        # fixing var3 = 0 leaves (var1 or var2) and (~var2)
+        self.assertEqual(driver.simplify_cnf(input, {3: 0}), [[1, 2], [-2]])
+        # fixing var2 and var3 to 0 leaves (var1)
+        self.assertEqual(driver.simplify_cnf(input, {2: 0, 3: 0}), [[1]])
+
+        # 2 variables + 5 counting bits + 2 clauses + 1 output = 10 qubits,
+        # against a budget of one 9 qubit statevector
+        os.environ["QC_MEMORY_GB"] = repr(2**9 * 8 / 2**30)
+        try:
+            self.assertEqual(driver.partition_bits([[1, 2], [-2]], 2, 5, 1), 1)
+            # two partitions simulated at once must fit together
+            self.assertEqual(driver.partition_bits([[1, 2], [-2]], 2, 5, 2), 2)
+            # fixing every variable leaves nothing to simulate, however small the budget
+            os.environ["QC_MEMORY_GB"] = repr(1 / 2**30)
+            self.assertEqual(driver.partition_bytes([[1, 2], [-2]], 2, 2, 5), 0)
+            self.assertEqual(driver.partition_bits([[1, 2], [-2]], 2, 5, 4), 2)
+        finally:
+            del os.environ["QC_MEMORY_GB"]
+
+        # the remaining partition has a single solution, 01
+        sols = driver.count_partition([[1, 2], [-2]], 2, 5, 1000)
+        self.assertTrue(np.allclose(np.round(sols), 1))
+        self.assertEqual(driver.search_partition([[1, 2], [-2]], 2, sols, 100), '01')
+
+        # a worker's Aer thread cap is forwarded to the simulation
+        driver.init_worker(2**30, 1)
+        try:
+            self.assertEqual(driver._worker_threads, 1)
+            self.assertEqual(driver.search_partition([[1, 2], [-2]], 2, sols, 100), '01')
+        finally:
+            driver._worker_threads = 0
+            del os.environ["QC_MEMORY_GB"]
+
 if __name__ == "__main__":
 	unittest.main()
\ No newline at end of file